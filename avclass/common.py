@@ -16,6 +16,10 @@ platform_prefix = "FILE:os:"
 # Default category for tags in taxonomy with no category
 uncategorized_cat = "UNC"
 
+# Category for tags not in the taxonomy, interned so that category
+# comparisons and dict lookups reduce to pointer checks
+unknown_cat = sys.intern("UNK")
+
 SampleInfo = namedtuple("SampleInfo", ["md5", "sha1", "sha256", "labels", "vt_tags"])
 
 # AVs to use in suffix removal
@@ -49,7 +53,7 @@ class Tag:
         word_list = s.strip().split(":")
         if len(word_list) > 1:
             self._name = word_list[-1].lower()
-            self._cat = word_list[0].upper()
+            self._cat = sys.intern(word_list[0].upper())
             self._prefix_l = [x.lower() for x in word_list[1:-1]]
             path = self._cat
             for x in self._prefix_l:
@@ -188,7 +192,7 @@ class Taxonomy:
         :return: The category
         """
         t = self._tag_map.get(tag, None)
-        return getattr(t, "cat", "UNK")
+        return getattr(t, "cat", unknown_cat)
 
     def get_path(self, tag: AnyStr) -> AnyStr:
         """
@@ -342,6 +346,8 @@ class Rules:
         :param filepath: The file to read from
         """
         self._src_map = {}
+        # Cache of frozenset dst signatures, invalidated on rule changes
+        self._sig_map = {}
         if filepath:
             self.read_rules(filepath)
 
@@ -371,6 +377,7 @@ class Rules:
 
         logger.debug("[Rules] Adding %s -> %s" % (src, dst_l))
         src_tag = Tag(src)
+        self._sig_map.pop(src_tag.name, None)
         if overwrite:
             target_l = [Tag(dst).name for dst in dst_l]
             self._src_map[src_tag.name] = set(target_l)
@@ -386,6 +393,7 @@ class Rules:
         if dst:
             logger.debug("[Rules] Removing rule: %s -> %s" % (src, dst))
             del self._src_map[src]
+            self._sig_map.pop(src, None)
             return True
         return False
 
@@ -398,6 +406,19 @@ class Rules:
         """
         return list(self._src_map.get(src, []))
 
+    def dst_sig(self, src: AnyStr) -> frozenset:
+        """
+        Returns a cached frozenset signature of the dst belonging to src.
+
+        :param src: The source rule
+        :return: Frozenset of dst
+        """
+        sig = self._sig_map.get(src)
+        if sig is None:
+            sig = frozenset(self._src_map.get(src, ()))
+            self._sig_map[src] = sig
+        return sig
+
     def read_rules(self, filepath: AnyStr):
         """
         Read rules from a file and create the rule-map.
@@ -464,6 +485,7 @@ class Rules:
         for src in src_l:
             dst_l = self.expand_src_destinations(src)
             self._src_map[src] = dst_l
+        self._sig_map.clear()
 
 
 class Translation(Rules):
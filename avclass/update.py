@@ -3,9 +3,10 @@ import logging
 import os
 import sys
 
-from collections import namedtuple
+from collections import Counter, deque
+from dataclasses import dataclass
 from operator import itemgetter
-from typing import AnyStr, Collection, Optional, Set, TextIO
+from typing import AnyStr, Collection, List, Optional, Set, TextIO
 
 from avclass import util
 from avclass.common import Taxonomy, Expansion, Translation
@@ -24,10 +25,25 @@ root.addHandler(handler_stderr)
 # Threshold for string similarity
 # sim_threshold = 0.6
 
-Relation = namedtuple('Relation', ['t1', 't2', 't1_num', 't2_num', 'nalias_num', 'talias_num', 'tinv_alias_num'])
+@dataclass(slots=True, frozen=True)
+class Relation:
+    t1: str
+    t2: str
+    t1_num: int
+    t2_num: int
+    nalias_num: int
+    talias_num: float
+    tinv_alias_num: float
 
 
 class Update:
+    # Category pairs (c1, c2) for which a relation implies an expansion
+    _EXPANSION_PAIRS = frozenset({
+        ("FAM", "FILE"), ("FAM", "BEH"), ("FAM", "CLASS"),
+        ("CLASS", "FILE"), ("CLASS", "BEH"),
+        ("UNK", "BEH"), ("UNK", "CLASS"),
+    })
+
     def __init__(self, rel_filepath: AnyStr, in_taxonomy: Taxonomy, in_translation: Translation,
                  in_expansion: Expansion, n, t):
         self._out_taxonomy = in_taxonomy
@@ -36,18 +52,48 @@ class Update:
         self._n = n
         self._t = t
         # Initialize blacklist
-        self.blist = in_taxonomy.platform_tags()
+        self.blist = frozenset(in_taxonomy.platform_tags())
         # Maps src -> cnt
         self.src_map = {}
+        # Relations in parse order; run() tracks liveness by index
+        self._rels = []
+        # Maps tag -> set of relation indices referencing it
+        self._by_tag = {}
+        # Tags mutated by the last add_tag/add_alias call
+        self._mutated_tags = set()
         # Read relations from file
         self.rel_set = self.read_relations(rel_filepath)
-        self.dst_map = {}
-        self.cat_pairs_map = {}
+        self.dst_map = Counter()
+        self.cat_pairs_map = Counter()
+        # Cache taxonomy category/path for each tag in the relations
+        self._cat = {t: self._out_taxonomy.get_category(t) for t in self.src_map}
+        self._path = {t: self._out_taxonomy.get_path(t) for t in self.src_map}
+        # Dispatch table for process_relation keyed on category pair
+        self._dispatch = {
+            ("UNK", "FAM"): self._relation_alias_fam,
+            ("UNK", "CLASS"): self._relation_tag_fam,
+            ("UNK", "BEH"): self._relation_tag_fam,
+            ("UNK", "FILE"): self._relation_tag_file,
+            ("UNK", "UNK"): self._relation_alias_fam,
+            ("FAM", "UNK"): self._relation_alias_fam,
+            ("FILE", "UNK"): self._relation_alias_p1_prefix,
+            ("FAM", "FAM"): self._relation_alias_p2_prefix,
+        }
 
     # TODO - @property decorator
     def num_rules(self) -> int:
         return len(self.rel_set)
 
+    def _refresh_tag(self, tag: AnyStr):
+        """
+        Refresh the cached category/path of a tag after a Taxonomy update
+
+        :param tag: The tag
+        :return: None
+        """
+        self._cat[tag] = self._out_taxonomy.get_category(tag)
+        self._path[tag] = self._out_taxonomy.get_path(tag)
+
     def is_weak_rel(self, rel: Relation) -> bool:
         """
         Boolean whether or not the relationship is considered weak (doesn't meet thresholds).
@@ -55,8 +101,7 @@ class Update:
         :param rel: The relationship
         :return: Boolean
         """
-        return ((int(rel.nalias_num) < self._n) or
-                (float(rel.talias_num) < self._t))
+        return rel.nalias_num < self._n or rel.talias_num < self._t
 
     def is_blacklisted_rel(self, rel: Relation) -> bool:
         """
@@ -67,11 +112,15 @@ class Update:
         """
         return rel.t1 in self.blist or rel.t2 in self.blist
 
-    def is_known_rel(self, rel: Relation) -> bool:
+    def is_known_rel(self, rel: Relation, *,
+                     tr_t1: Optional[List[AnyStr]] = None,
+                     tr_t2: Optional[List[AnyStr]] = None) -> bool:
         """
         Boolean whether or not the relationship is known.
 
         :param rel: The relationship
+        :param tr_t1: Precomputed translation destinations for rel.t1
+        :param tr_t2: Precomputed translation destinations for rel.t2
         :return: Boolean
         """
         t1 = rel.t1
@@ -80,17 +129,22 @@ class Update:
         if self._out_taxonomy.overlaps(t1, t2):
             return True
         # Known expansion rule
-        t1_dst = self._out_expansion.get_dst(t1)
-        t2_dst = self._out_expansion.get_dst(t2)
-        if t2 in t1_dst or t1 in t2_dst:
+        if t2 in self._out_expansion.get_dst(t1):
+            return True
+        if t1 in self._out_expansion.get_dst(t2):
             return True
         # Known tagging rule
-        t1_dst = sorted(self._out_translation.get_dst(t1))
-        t2_dst = sorted(self._out_translation.get_dst(t2))
-        if t2 in t1_dst or t1 in t2_dst:
+        if tr_t1 is None:
+            tr_t1 = self._out_translation.get_dst(t1)
+        if t2 in tr_t1:
+            return True
+        if tr_t2 is None:
+            tr_t2 = self._out_translation.get_dst(t2)
+        if t1 in tr_t2:
             return True
         # Known alias in tagging
-        if t1_dst and t1_dst == t2_dst:
+        sig_t1 = self._out_translation.dst_sig(t1)
+        if sig_t1 and sig_t1 == self._out_translation.dst_sig(t2):
             return True
         return False
 
@@ -105,20 +159,25 @@ class Update:
         dst = self._out_translation.get_dst(name)
         if not dst:
             self._out_taxonomy.add_tag(path)
+            self._refresh_tag(name)
+            self._mutated_tags.add(name)
 
-    def add_expansion(self, src: AnyStr, dst_l: Collection[AnyStr]):
+    def add_expansion(self, src: AnyStr, dst_l: Collection[AnyStr], *,
+                      tr_src: Optional[List[AnyStr]] = None):
         """
         Add expansion rule to fix destination if the source is in Translation.
 
         :param src: The source label
         :param dst_l: A list of destination labels
+        :param tr_src: Precomputed translation destinations for src
         :return: None
         """
         ''' Add expansion rule fixing destination if src in tagging '''
         # Select source handling aliases
-        dst = self._out_translation.get_dst(src)
-        if dst:
-            new_src = dst[0]
+        if tr_src is None:
+            tr_src = self._out_translation.get_dst(src)
+        if tr_src:
+            new_src = tr_src[0]
         else:
             new_src = src
         # Select destinations removing overlaps with existing rule
@@ -130,26 +189,32 @@ class Update:
         else:
             self._out_expansion.add_rule(new_src, dst_l, True)
 
-    def add_alias(self, src: AnyStr, dst: AnyStr, dst_prefix: AnyStr):
+    def add_alias(self, src: AnyStr, dst: AnyStr, dst_prefix: AnyStr, *,
+                  tr_src: Optional[List[AnyStr]] = None,
+                  tr_dst: Optional[List[AnyStr]] = None):
         """
         Add alias relation to the Taxonomy and Translation
 
         :param src: Source alias
         :param dst: Destination alias
         :param dst_prefix: Destination prefix
+        :param tr_src: Precomputed translation destinations for src
+        :param tr_dst: Precomputed translation destinations for dst
         :return: None
         """
         # If src in tagging, use most popular target
-        tr_dst = self._out_translation.get_dst(src)
+        if tr_src is None:
+            tr_src = self._out_translation.get_dst(src)
         target = dst
-        if tr_dst:
+        if tr_src:
             cnt_max = self.src_map[dst]
-            for e in tr_dst:
+            for e in tr_src:
                 cnt = self.src_map.get(e, 0)
                 if cnt > cnt_max:
                     target = e
         # If dst is in tagging, update tagging rule destination,
-        tr_dst = self._out_translation.get_dst(dst)
+        if tr_dst is None:
+            tr_dst = self._out_translation.get_dst(dst)
         if tr_dst:
             target_l = tr_dst
         # else add dst to taxonomy
@@ -160,6 +225,10 @@ class Update:
         self._out_taxonomy.remove_tag(src)
         # Replace tagging rule
         self._out_translation.add_rule(src, target_l, True)
+        # Refresh cached categories/paths for the mutated tags
+        self._refresh_tag(src)
+        self._refresh_tag(dst)
+        self._mutated_tags.update((src, dst))
 
     def is_expansion_rel(self, rel: Relation) -> bool:
         """
@@ -168,11 +237,7 @@ class Update:
         :param rel: The relation
         :return: Boolean
         """
-        c1 = self._out_taxonomy.get_category(rel.t1)
-        c2 = self._out_taxonomy.get_category(rel.t2)
-        return (((c1 == "FAM") and (c2 != c1) and (c2 != "UNK")) or
-                ((c1 == "CLASS") and ((c2 == "FILE") or (c2 == "BEH"))) or
-                ((c1 == "UNK") and ((c2 == "BEH") or (c2 == "CLASS"))))
+        return (self._cat[rel.t1], self._cat[rel.t2]) in Update._EXPANSION_PAIRS
 
     def find_expansions(self):
         """
@@ -180,21 +245,21 @@ class Update:
 
         :return: None
         """
-        acc = []
+        acc = set()
+        debug = logger.isEnabledFor(logging.DEBUG)
         for rel in self.rel_set:
-            p1 = self._out_taxonomy.get_path(rel.t1)
-            p2 = self._out_taxonomy.get_path(rel.t2)
-            logger.debug("Processing %s\t%s" % (p1, p2))
             # Ignore relations where t1 is an alias
-            dst = self._out_translation.get_dst(rel.t1)
-            if dst:
-                logger.debug("Ignoring relation for alias %s" % p1)
+            tr_t1 = self._out_translation.get_dst(rel.t1)
+            if tr_t1:
+                if debug:
+                    logger.debug("Ignoring relation for alias %s", self._path[rel.t1])
                 continue
+            if debug:
+                logger.debug("Processing %s\t%s", self._path[rel.t1], self._path[rel.t2])
             if self.is_expansion_rel(rel):
-                self.add_expansion(rel.t1, [rel.t2])
-                acc.append(rel)
-        for rel in acc:
-            self.rel_set.remove(rel)
+                self.add_expansion(rel.t1, [rel.t2], tr_src=tr_t1)
+                acc.add(rel)
+        self.rel_set -= acc
 
     # def is_alias_rel(self, rel):
     #    ''' Return true if relation implies alias rule '''
@@ -214,94 +279,92 @@ class Update:
     #            self.G.add_edge(rel.t1, rel.t2, score=rel.talias_num)
     #    self.output_components("comp")
 
-    def process_relation(self, rel: Relation):
+    def _relation_alias_fam(self, rel: Relation, p1: AnyStr, p2: AnyStr, tr_t1, tr_t2):
+        # UNK -> FAM, FAM -> UNK, UNK -> UNK : alias-family
+        self.add_alias(rel.t1, rel.t2, "FAM", tr_src=tr_t1, tr_dst=tr_t2)
+        return 1
+
+    def _relation_tag_fam(self, rel: Relation, p1: AnyStr, p2: AnyStr, tr_t1, tr_t2):
+        # UNK -> CLASS, UNK -> BEH : taxonomy-family
+        # Return 0 so that expansion handled at end
+        self.add_tag(rel.t1, 'FAM:%s' % rel.t1)
+        return 0
+
+    def _relation_tag_file(self, rel: Relation, p1: AnyStr, p2: AnyStr, tr_t1, tr_t2):
+        # UNK -> FILE : taxonomy-file
+        self.add_tag(rel.t1, '%s:%s' % (p2, rel.t1))
+        return 1
+
+    def _relation_alias_p1_prefix(self, rel: Relation, p1: AnyStr, p2: AnyStr, tr_t1, tr_t2):
+        # FILE -> UNK : alias-file
+        self.add_alias(rel.t1, rel.t2, p1.rpartition(':')[0], tr_src=tr_t1, tr_dst=tr_t2)
+        return 1
+
+    def _relation_alias_p2_prefix(self, rel: Relation, p1: AnyStr, p2: AnyStr, tr_t1, tr_t2):
+        # FAM -> FAM : same category, alias
+        self.add_alias(rel.t1, rel.t2, p2.rpartition(':')[0], tr_src=tr_t1, tr_dst=tr_t2)
+        return 1
+
+    def check_and_process(self, rel: Relation):
+        """
+        Check whether a relation is known and process it otherwise.
+
+        Computes the translation lookups shared by is_known_rel,
+        process_relation and the add_* helpers only once.
+
+        :param rel: The relation
+        :return: None if the relation is known, else the process_relation result
+        """
+        tr_t1 = self._out_translation.get_dst(rel.t1)
+        tr_t2 = self._out_translation.get_dst(rel.t2)
+        if self.is_known_rel(rel, tr_t1=tr_t1, tr_t2=tr_t2):
+            return None
+        return self.process_relation(rel, tr_t1=tr_t1, tr_t2=tr_t2)
+
+    def process_relation(self, rel: Relation, *,
+                         tr_t1: Optional[List[AnyStr]] = None,
+                         tr_t2: Optional[List[AnyStr]] = None):
         """
         Process relation and update Taxonomy/Translation
 
         :param rel: The relation
+        :param tr_t1: Precomputed translation destinations for rel.t1
+        :param tr_t2: Precomputed translation destinations for rel.t2
         :return:
         """
         t1 = rel.t1
         t2 = rel.t2
-        p1, c1 = self._out_taxonomy.get_info(rel.t1)
-        p2, c2 = self._out_taxonomy.get_info(rel.t2)
-
-        logger.debug("Processing %s\t%s" % (p1, p2))
+        p1 = self._path[t1]
+        c1 = self._cat[t1]
+        p2 = self._path[t2]
+        c2 = self._cat[t2]
+        if tr_t1 is None:
+            tr_t1 = self._out_translation.get_dst(t1)
+        if tr_t2 is None:
+            tr_t2 = self._out_translation.get_dst(t2)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Processing %s\t%s", p1, p2)
 
         # If both directions strong, then equivalent, i.e., alias
-        if float(rel.tinv_alias_num) >= args.t:
+        if rel.tinv_alias_num >= self._t:
             if c1 != "UNK" and c2 == "UNK":
-                prefix = p1[0:p1.rfind(':')]
+                prefix = p1.rpartition(':')[0]
             elif c1 == "UNK" and c2 != "UNK":
-                prefix = p2[0:p2.rfind(':')]
+                prefix = p2.rpartition(':')[0]
             elif c1 == "UNK" and c2 == "UNK":
                 prefix = "FAM"
             elif c1 == c2:
-                prefix = p1[0:p1.rfind(':')]
+                prefix = p1.rpartition(':')[0]
             else:
                 logger.warning("Equivalent rule with different categories: %s\t%s" % (p1, p2))
                 return -1
-            self.add_alias(t1, t2, prefix)
+            self.add_alias(t1, t2, prefix, tr_src=tr_t1, tr_dst=tr_t2)
             return 1
 
-        # UNK -> FAM : alias-family
-        elif (c1 == "UNK") and (c2 == 'FAM'):
-            self.add_alias(t1, t2, "FAM")
-            return 1
-
-        # UNK -> CLASS : taxonomy-family
-        # Return 0 so that expansion handled at end
-        elif (c1 == "UNK") and (c2 == 'CLASS'):
-            self.add_tag(t1, 'FAM:%s' % t1)
-            return 0
-
-        # UNK -> BEH : taxonomy-family
-        # Return 0 so that expansion handled at end
-        elif (c1 == "UNK") and (c2 == 'BEH'):
-            self.add_tag(t1, 'FAM:%s' % t1)
-            return 0
-
-        # UNK -> FILE : taxonomy-file
-        elif (c1 == "UNK") and (c2 == 'FILE'):
-            self.add_tag(t1, '%s:%s' % (p2, t1))
-            return 1
-
-        # UNK -> UNK
-        elif (c1 == "UNK") and (c2 == "UNK"):
-            self.add_alias(t1, t2, "FAM")
-            return 1
-
-        # FAM -> UNK : alias-family
-        elif (c1 == "FAM") and (c2 == "UNK"):
-            self.add_alias(t1, t2, "FAM")
-            return 1
-
-        # FILE -> UNK : alias-file
-        elif (c1 == "FILE") and (c2 == "UNK"):
-            prefix = p1[0:p1.rfind(':')]
-            self.add_alias(t1, t2, prefix)
-            return 1
-
-        # Same category : alias
-        elif (c1 == "FAM") and (c2 == "FAM"):
-            prefix = p2[0:p2.rfind(':')]
-            self.add_alias(t1, t2, prefix)
-            return 1
-
-        # Target unknown
-        elif c2 == "UNK":
-            # If tokens are similar, likely family aliases
-            # log.info("Similarity: %.02f" % levenshtein_ratio(t1, t2))
-            # if (levenshtein_ratio(t1, t2) > sim_threshold):
-            #     prefix = p1[0:p1.rfind(':')]
-            #     self.add_alias(t1, t2, prefix)
-            #     return 1
-            # else:
-            #     return 0
-            return 0
-
-        # Default: review taxonomy
-        return 0
+        # Dispatch on category pair; default is to review taxonomy
+        handler = self._dispatch.get((c1, c2))
+        return handler(rel, p1, p2, tr_t1, tr_t2) if handler else 0
 
     def run(self):
         """
@@ -309,34 +372,57 @@ class Update:
 
         :return: None
         """
-        num_iter = 0
-        while self.rel_set:
-            # Do a pass in remaining relations
-            cnt = 0
-            new_set = set()
-            logger.debug("[-] %03d Processing relations" % num_iter)
-            while self.rel_set:
-                rel = self.rel_set.pop()
-                # If known relation, continue
-                if self.is_known_rel(rel):
-                    continue
+        rels = self._rels
+        n_rels = len(rels)
+        # Flat per-relation state indexed in parse order: flipping a byte
+        # replaces hashing relations into side sets on every queue operation
+        alive = bytearray(n_rels)
+        queued = bytearray(n_rels)
+        # Relations needing a fresh known-check after a tag mutation
+        recheck = bytearray(n_rels)
+
+        # One-shot prune of relations that are already known
+        logger.debug("[-] Pruning known relations")
+        for i, rel in enumerate(rels):
+            if not self.is_known_rel(rel):
+                alive[i] = 1
+
+        logger.debug("[-] Processing relations")
+        pending = deque(i for i in range(n_rels) if alive[i])
+        for i in pending:
+            queued[i] = 1
+        while pending:
+            i = pending.popleft()
+            queued[i] = 0
+            if not alive[i]:
+                continue
+            rel = rels[i]
 
-                # Process relation
+            self._mutated_tags.clear()
+            if recheck[i]:
+                # Re-check known status sharing the translation lookups
+                recheck[i] = 0
+                result = self.check_and_process(rel)
+            else:
+                # Survived the prune untouched, so it cannot be known yet
                 result = self.process_relation(rel)
 
-                if result:
-                    cnt += 1
-                else:
-                    new_set.add(rel)
+            # If known or processed relation, drop it
+            if result is None or result:
+                alive[i] = 0
 
-            # Update relation set
-            self.rel_set = new_set
+            if result:
+                # Flag and re-enqueue surviving relations whose tags mutated
+                for tag in self._mutated_tags:
+                    for j in self._by_tag.get(tag, ()):
+                        if alive[j]:
+                            recheck[j] = 1
+                            if not queued[j]:
+                                pending.append(j)
+                                queued[j] = 1
 
-            # If no relations processed, finish
-            if cnt == 0:
-                break
-            else:
-                num_iter += 1
+        # Rebuild the surviving relation set for expansions and output
+        self.rel_set = {rels[i] for i in range(n_rels) if alive[i]}
 
         # Find aliases
         # self.find_aliases()
@@ -355,63 +441,86 @@ class Update:
         ''' Returns relations in file as a set
             Filters weak and blacklisted relations '''
         rel_set = set()
-        with open(filepath, 'r') as fd:
+        # Bind hot attributes to locals for the parse loop
+        blist = self.blist
+        min_n = self._n
+        min_t = self._t
+        add = rel_set.add
+        src_map = self.src_map
+        with open(filepath, 'rb') as fd:
             for line in fd:
                 # Ignore comments
-                if line.startswith('#'):
+                if line[:1] == b'#':
                     continue
                 # Parse line
-                t1, t2, t1_num, t2_num, nalias_num, talias_num, tinv_alias_num = line.strip().split('\t')
-                # Build relation
-                rel = Relation(t1, t2, t1_num, t2_num, nalias_num,
-                               talias_num, tinv_alias_num)
-                # Ignore weak relations
-                if self.is_weak_rel(rel):
+                parts = line.rstrip().split(b'\t')
+                # Filter in order of selectivity and cost: the n threshold
+                # discards most rows with a single int comparison
+                nalias_num = int(parts[4])
+                if nalias_num < min_n:
                     continue
                 # Ignore blacklisted relations
-                if self.is_blacklisted_rel(rel):
+                # Tags are interned: they are compared and hashed on every
+                # relation check, so equality becomes a pointer check
+                t1 = sys.intern(parts[0].decode())
+                t2 = sys.intern(parts[1].decode())
+                if t1 in blist or t2 in blist:
+                    continue
+                # Ignore weak relations, deferring the float conversion
+                # until the cheap filters have passed
+                talias_num = float(parts[5])
+                if talias_num < min_t:
                     continue
                 # Ignore known relations
                 # NOTE: commented since we check if a
                 # relation is known before processing it
                 # if self.is_known_rel(rel):
                 #     continue
+                # Build relation coercing numeric fields once
+                rel = Relation(t1, t2, int(parts[2]), int(parts[3]),
+                               nalias_num, talias_num, float(parts[6]))
+                # Ignore duplicate rows
+                if rel in rel_set:
+                    continue
                 # Add relation to set
-                rel_set.add(rel)
+                add(rel)
+                self._rels.append(rel)
+                # Index relation by the tags it references
+                idx = len(self._rels) - 1
+                self._by_tag.setdefault(t1, set()).add(idx)
+                self._by_tag.setdefault(t2, set()).add(idx)
                 # Add to src_map
-                self.src_map[rel.t1] = rel.t1_num
-                self.src_map[rel.t2] = rel.t2_num
+                src_map[t1] = rel.t1_num
+                src_map[t2] = rel.t2_num
 
         return rel_set
 
     def output_relations(self, filepath: AnyStr):
-        with open(filepath, 'w') as fd:
-            fd.write("# t1\tt2\t|t1|\t|t2|\t|t1^t2|\t|t1^t2|/|t1|\t|t1^t2|/|t2|\n")
-            sorted_rules = sorted(self.rel_set,
-                                  key=lambda r: (self._out_taxonomy.get_category(r.t1),
-                                                 self._out_taxonomy.get_category(r.t2)))
-            for rel in sorted_rules:
-                p1, c1 = self._out_taxonomy.get_info(rel.t1)
-                p2, c2 = self._out_taxonomy.get_info(rel.t2)
-                fd.write("%s\t%s\t%s\t%s\t%s\t%s\t%s\n" % (p1, p2, rel.t1_num, rel.t2_num, rel.nalias_num,
-                                                           rel.talias_num, rel.tinv_alias_num))
+        # Decorate-sort-undecorate so categories are computed once per relation
+        keyed = [((self._cat[r.t1], self._cat[r.t2]), r) for r in self.rel_set]
+        keyed.sort(key=itemgetter(0))
+        rows = ["# t1\tt2\t|t1|\t|t2|\t|t1^t2|\t|t1^t2|/|t1|\t|t1^t2|/|t2|\n"]
+        for _, rel in keyed:
+            p1 = self._path[rel.t1]
+            p2 = self._path[rel.t2]
+            rows.append(f"{p1}\t{p2}\t{rel.t1_num}\t{rel.t2_num}\t"
+                        f"{rel.nalias_num}\t{rel.talias_num}\t{rel.tinv_alias_num}\n")
+        with open(filepath, 'w', buffering=1 << 20) as fd:
+            fd.writelines(rows)
 
     def output_rule_stats(self, fd: TextIO):
         # Compute rule statistics
         for rel in self.rel_set:
-            c1 = self._out_taxonomy.get_category(rel.t1)
-            c2 = self._out_taxonomy.get_category(rel.t2)
-            self.cat_pairs_map[(c1, c2)] = self.cat_pairs_map.get((c1, c2), 0) + 1
-            self.dst_map[rel.t2] = self.dst_map.get(rel.t2, 0) + 1
+            self.cat_pairs_map[(self._cat[rel.t1], self._cat[rel.t2])] += 1
+            self.dst_map[rel.t2] += 1
         # Output statistics
-        cat_pairs = sorted(update.cat_pairs_map.items(), key=itemgetter(1, 0), reverse=True)
-        for c1, c2, cnt in cat_pairs:
-            fd.write("%s\t%s\t%03d\n" % (c1, c2, cnt))
+        cat_pairs = sorted(self.cat_pairs_map.items(), key=itemgetter(1, 0), reverse=True)
+        rows = ["%s\t%s\t%03d\n" % (c1, c2, cnt) for (c1, c2), cnt in cat_pairs]
 
         # Print dst statistics
-        dst_pairs = sorted(update.dst_map.items(), key=itemgetter(1, 0))
-        for dst, cnt in dst_pairs:
-            fd.write("%s\t%03d\n" % (taxonomy.get_path(dst), cnt))
+        dst_pairs = sorted(self.dst_map.items(), key=itemgetter(1, 0))
+        rows.extend("%s\t%03d\n" % (self._path[dst], cnt) for dst, cnt in dst_pairs)
+        fd.writelines(rows)
 
     @staticmethod
     def output(prefix: Optional[AnyStr] = None):